@@ -4,28 +4,81 @@ Handles user authentication, registration, and session management
 """
 
 import streamlit as st
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import numpy as np
 import pandas as pd
+import hashlib
+import hmac
 import logging
+import threading
+import time
 
 from .storage import StorageBase
 from .utils import get_ist_now, generate_id
 
 logger = logging.getLogger(__name__)
 
+# With cache_auth_results, results are reused for repeat credentials within this window
+AUTH_CACHE_TTL_SECONDS = 60
+AUTH_CACHE_MAX_ENTRIES = 128
+
+def _find_user_position(user_ids: np.ndarray, target_id: str) -> int:
+    """Position of the first row whose stripped user_id equals target_id, or -1"""
+    matches = np.flatnonzero(np.char.strip(user_ids.astype(str)) == target_id)
+    return int(matches[0]) if len(matches) else -1
+
+def _password_matches(password: str, stored_password: Any) -> bool:
+    """Constant-time check of a password against a stored plain_password cell"""
+    if not isinstance(stored_password, str):
+        return False
+    return hmac.compare_digest(password.encode('utf-8'), stored_password.encode('utf-8'))
+
 class AuthService:
     """Authentication service with plain text password storage"""
     
-    def __init__(self, storage: StorageBase):
+    def __init__(self, storage: StorageBase, cache_auth_results: bool = False):
         self.storage = storage
+        # Off by default: cached results can't see Users edits made outside this object
+        self.cache_auth_results = cache_auth_results
+        self._auth_cache: Dict[Tuple[str, str, int], Optional[Dict[str, Any]]] = {}
+        # One AuthService serves every session (st.cache_resource), so cache access is locked
+        self._auth_cache_lock = threading.Lock()
+        # Registrations in this process run one at a time (see _register_user)
+        self._register_lock = threading.Lock()
     
-    def create_account(self, user_id: str, password: str, role: str = "user", name: str = "", email: str = "") -> bool:
-        """Create a new user account with plain text password"""
+    def create_account(self, user_id: str, password: str, role: str = "user", name: str = "", email: str = "",
+                       created_at: Optional[str] = None) -> Dict[str, Any]:
+        """Create a new user account with plain text password, returning the row written;
+        `created_at` (ISO string) defaults to now in IST"""
         try:
-            logger.info(f"Creating account for user_id: {user_id}")
+            return self._register_user(user_id, password, role, name, email, created_at)
             
-            # Check if user already exists
-            users_df = self.storage.read_sheet("Users")
+        except Exception as e:
+            logger.error(f"Error creating account: {e}")
+            raise
+    
+    def create_and_authenticate(self, user_id: str, password: str, role: str = "user", name: str = "",
+                                email: str = "") -> Dict[str, Any]:
+        """Create an account and return the signed-in user without re-reading Users"""
+        try:
+            user_data = self._register_user(user_id, password, role, name, email)
+        except ValueError as e:
+            logger.error(f"Error creating account: {e}")
+            return {"success": False, "message": str(e)}
+        
+        user = self._user_profile(user_data, user_id.strip())
+        self._remember_auth_result(self._auth_cache_key(user_id, password), user)
+        return {"success": True, "user": dict(user)}
+    
+    def _register_user(self, user_id: str, password: str, role: str, name: str, email: str,
+                       created_at: Optional[str] = None) -> Dict[str, Any]:
+        """Validate and append a new Users row, returning the stored record"""
+        logger.info(f"Creating account for user_id: {user_id}")
+        
+        # Hold the lock from the uniqueness check to the append, so two registrations can't both pass
+        with self._register_lock:
+            # Check if user already exists against the sheet as it is now
+            users_df = self.storage.read_sheet("Users", usecols=['user_id', 'email'])
             logger.info(f"Current users count: {len(users_df)}")
             
             if not users_df.empty:
@@ -55,66 +108,98 @@ class AuthService:
                 "plain_password": password,  # Store plain password
                 "role": role.lower(),
                 "name": name or user_id,
-                "created_at": get_ist_now().isoformat(),
+                "created_at": created_at or get_ist_now().isoformat(),
                 "is_active": True
             }
             
             logger.info(f"User data prepared: {user_data}")
             self.storage.append_row("Users", user_data)
-            logger.info(f"User appended to storage successfully")
-            logger.info(f"User created: {user_id}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error creating account: {e}")
-            raise
+        
+        self.clear_auth_cache()
+        logger.info(f"User appended to storage successfully")
+        logger.info(f"User created: {user_id}")
+        return user_data
     
     def authenticate(self, user_id: str, password: str) -> Optional[Dict[str, Any]]:
         """Authenticate user with user_id and plain text password"""
+        cache_key = self._auth_cache_key(user_id, password)
+        with self._auth_cache_lock:
+            cached = self.cache_auth_results and cache_key in self._auth_cache
+            user = self._auth_cache.get(cache_key)
+        if cached:
+            logger.info(f"Using cached authentication result for user {cache_key[0]}")
+            return dict(user) if user else None
+        
         try:
-            users_df = self.storage.read_sheet("Users")
-            
-            if users_df.empty:
-                logger.info("No users found in database")
-                return None
-            
-            # Clean up user_id input and database values
-            clean_user_id = user_id.strip()
-            users_df['user_id'] = users_df['user_id'].astype(str).str.strip()
-            
-            # Find user by user_id only
-            user_rows = users_df[users_df['user_id'] == clean_user_id]
-            
-            if user_rows.empty:
-                logger.info(f"User {clean_user_id} not found in database")
-                return None
-            
-            user_row = user_rows.iloc[0]
-            stored_password = user_row.get('plain_password', '')
-            
-            logger.info(f"User {clean_user_id} found. Has plain_password: {bool(stored_password)}")
-            logger.info(f"Stored password length: {len(stored_password) if stored_password else 0}")
-            logger.info(f"Input password length: {len(password)}")
-            
-            # Verify password - simple string comparison
-            if password == stored_password:
-                logger.info(f"Password match successful for user {clean_user_id}")
-                return {
-                    "email": user_row['email'],
-                    "user_id": user_row['user_id'].strip(),
-                    "role": user_row['role'],
-                    "name": user_row.get('name', user_row['user_id']).strip(),
-                    "created_at": user_row['created_at'],
-                    "is_active": user_row.get('is_active', True)
-                }
-            else:
-                logger.info(f"Password mismatch for user {clean_user_id}")
-            
-            return None
-            
+            user = self._verify_credentials(user_id, password)
         except Exception as e:
             logger.error(f"Authentication error: {e}")
             return None
+        
+        self._remember_auth_result(cache_key, user)
+        return dict(user) if user else None
+    
+    def _verify_credentials(self, user_id: str, password: str) -> Optional[Dict[str, Any]]:
+        """Look up user_id in the Users sheet and compare the password"""
+        users_df = self.storage.read_sheet("Users")
+        
+        if users_df.empty:
+            logger.info("No users found in database")
+            return None
+        
+        # Find user by user_id only, comparing cleaned-up values in a single NumPy pass
+        clean_user_id = user_id.strip()
+        position = _find_user_position(users_df['user_id'].to_numpy(), clean_user_id)
+        
+        if position < 0:
+            logger.info(f"User {clean_user_id} not found in database")
+            return None
+        
+        user_row = users_df.iloc[position]
+        stored_password = user_row.get('plain_password', '')
+        
+        logger.info(f"User {clean_user_id} found. Has plain_password: {bool(stored_password)}")
+        logger.info(f"Stored password length: {len(stored_password) if stored_password else 0}")
+        logger.info(f"Input password length: {len(password)}")
+        
+        # Verify password - constant-time string comparison
+        if _password_matches(password, stored_password):
+            logger.info(f"Password match successful for user {clean_user_id}")
+            return self._user_profile(user_row, clean_user_id)
+        else:
+            logger.info(f"Password mismatch for user {clean_user_id}")
+        
+        return None
+    
+    def _user_profile(self, record, user_id: str) -> Dict[str, Any]:
+        """Session-safe view of a Users record (no password fields)"""
+        return {
+            "email": record['email'],
+            "user_id": user_id,
+            "role": record['role'],
+            "name": record.get('name', user_id).strip(),
+            "created_at": record['created_at'],
+            "is_active": record.get('is_active', True)
+        }
+    
+    def _auth_cache_key(self, user_id: str, password: str) -> Tuple[str, str, int]:
+        """Cache key for a credential pair; the time bucket expires entries"""
+        password_digest = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        return (user_id.strip(), password_digest, int(time.time() // AUTH_CACHE_TTL_SECONDS))
+    
+    def _remember_auth_result(self, cache_key: Tuple[str, str, int], user: Optional[Dict[str, Any]]) -> None:
+        """Store an authentication result, dropping entries from older time buckets"""
+        if not self.cache_auth_results:
+            return
+        with self._auth_cache_lock:
+            if len(self._auth_cache) >= AUTH_CACHE_MAX_ENTRIES or any(key[2] != cache_key[2] for key in self._auth_cache):
+                self._auth_cache.clear()
+            self._auth_cache[cache_key] = dict(user) if user else None
+    
+    def clear_auth_cache(self) -> None:
+        """Forget cached authentication results after any change to Users"""
+        with self._auth_cache_lock:
+            self._auth_cache.clear()
     
     def update_user_to_plain_password(self, user_id: str, new_password: str) -> bool:
         """Update existing user to use plain password authentication"""
@@ -128,6 +213,7 @@ class AuthService:
                 return row
             
             updated_count = self.storage.update_rows("Users", filter_fn, update_fn)
+            self.clear_auth_cache()
             
             if updated_count > 0:
                 logger.info(f"Updated user {user_id} to use plain password")
@@ -220,6 +306,7 @@ class AuthService:
             return row
         
         updated_count = self.storage.update_rows("Users", filter_fn, update_fn)
+        self.clear_auth_cache()
         
         if updated_count > 0:
             logger.info(f"Updated role for user {user_id} to {new_role}")
@@ -240,7 +327,7 @@ class AuthService:
             stored_password = user_row.get('plain_password', '')
             
             # Verify old password
-            if old_password != stored_password:
+            if not _password_matches(old_password, stored_password):
                 raise ValueError("Current password is incorrect")
             
             # Validate new password
@@ -257,6 +344,7 @@ class AuthService:
                 return row
             
             updated_count = self.storage.update_rows("Users", filter_fn, update_fn)
+            self.clear_auth_cache()
             
             if updated_count > 0:
                 logger.info(f"Password changed for user: {user_id}")
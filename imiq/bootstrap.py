@@ -0,0 +1,45 @@
+"""
+IMIQ Bootstrap
+Builds the storage and settings objects the app starts with, once per process and storage source
+"""
+
+import functools
+import logging
+from typing import NamedTuple, Optional, Tuple
+
+from .storage import StorageBase, ExcelStorage, get_storage_instance
+from .settings import SettingsService
+
+logger = logging.getLogger(__name__)
+
+class AppSession(NamedTuple):
+    """Master workbook storage, the settings read from it, and the active storage they select"""
+    base_storage: ExcelStorage
+    settings_service: SettingsService
+    storage: StorageBase
+
+def _storage_secrets() -> Tuple[Optional[str], Optional[str]]:
+    """The Streamlit secrets get_storage_instance selects storage by: (service account, sheet id)"""
+    import streamlit as st
+    try:
+        if "GOOGLE_SERVICE_ACCOUNT" not in st.secrets:
+            return None, None
+        return str(st.secrets["GOOGLE_SERVICE_ACCOUNT"]), st.secrets.get('GOOGLE_SHEET_ID', '')
+    except FileNotFoundError:
+        # No secrets.toml at all, so storage falls back to Excel
+        return None, None
+
+def get_app_session(excel_path: str = "CZ_MasterSheet.xlsx") -> AppSession:
+    """Construct the app's storage stack; later calls with the same workbook and the same
+    Streamlit storage secrets reuse it"""
+    return _build_app_session(excel_path, *_storage_secrets())
+
+@functools.lru_cache(maxsize=4)
+def _build_app_session(excel_path: str, service_account: Optional[str],
+                       sheet_id: Optional[str]) -> AppSession:
+    """Build an AppSession; the secret arguments only key the cache, storage reads them itself"""
+    base_storage = ExcelStorage(excel_path)
+    settings_service = SettingsService(base_storage)
+    storage = get_storage_instance(settings_service)
+    logger.info(f"App session ready with {type(storage).__name__}")
+    return AppSession(base_storage, settings_service, storage)
@@ -15,7 +15,7 @@ import logging
 import time
 import hashlib
 
-from .storage import get_storage_instance
+from .storage import get_storage_instance, get_sheet_version
 from .kpis import (
     user_time_series, user_weekly_counts, user_monthly_counts,
     compute_user_performance_score, top_performers, get_user_conversion_rate,
@@ -39,8 +39,9 @@ MAX_RETRIES = 3
 RETRY_DELAY = 2
 
 def get_cache_key(sheet_name: str) -> str:
-    """Generate cache key for sheet data"""
-    return f"performance_cache_{sheet_name}_{int(time.time() // CACHE_TTL_SECONDS)}"
+    """Generate cache key for sheet data; storage writes bump the sheet version, so the key changes"""
+    return (f"performance_cache_{sheet_name}_{get_sheet_version(sheet_name)}_"
+            f"{int(time.time() // CACHE_TTL_SECONDS)}")
 
 def get_cached_sheet_data(storage, sheet_name: str) -> pd.DataFrame:
     """Get sheet data with caching to reduce API calls"""
@@ -0,0 +1,58 @@
+"""
+IMIQ Script Utilities
+Helpers shared by the standalone verify/check scripts; kept free of pandas/gspread imports
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import sys
+from importlib.util import find_spec
+
+# numexpr is optional; checked without importing it so startup stays cheap
+NUMEXPR_AVAILABLE = find_spec('numexpr') is not None
+
+# Below this many rows the single-threaded NumPy compare beats numexpr's setup cost
+NUMEXPR_MIN_ROWS = 10_000
+
+@contextlib.contextmanager
+def buffered_output():
+    """Collect print() output and write it to stdout in a single call; also usable as a decorator"""
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            yield
+    finally:
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+
+def eq_filter(df, col, val):
+    """Boolean array of rows where df[col] == val, using numexpr's threaded eval on large sheets;
+    blank cells (nan or pd.NA) never match"""
+    if NUMEXPR_AVAILABLE and len(df) > NUMEXPR_MIN_ROWS:
+        return df.eval(f"`{col}` == @val", engine='numexpr').fillna(False).to_numpy(dtype=bool)
+    return df[col].eq(val).fillna(False).to_numpy(dtype=bool)
+
+def file_fingerprint(path):
+    """(size, mtime_ns) of a file without reading it; None if it is missing"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def storage_fingerprint(storage, *paths):
+    """Key for the data behind storage plus the given files (e.g. the calling script);
+    None when the backend keeps nothing between runs or its revision can't be read"""
+    if hasattr(storage, 'file_path'):
+        data = file_fingerprint(storage.file_path)
+    elif hasattr(storage, 'spreadsheet'):
+        # Drive's modifiedTime moves on every edit, so no sheet has to be read
+        try:
+            data = (storage.sheet_id, storage.spreadsheet.get_lastUpdateTime())
+        except Exception:
+            return None
+    else:
+        return None
+    return hashlib.md5(repr([data, *map(file_fingerprint, paths)]).encode()).hexdigest()
@@ -7,18 +7,27 @@ import pandas as pd
 from typing import Dict, Any, Optional
 import logging
 import os
+import time
 
 from .storage import StorageBase
 from .utils import get_ist_now
 
 logger = logging.getLogger(__name__)
 
+# Cached settings are re-read after this long, so edits made directly in the sheet show up
+SETTINGS_CACHE_TTL_SECONDS = 60
+
 class SettingsService:
     """Service for managing application settings and configuration"""
     
     def __init__(self, storage: StorageBase):
         self.storage = storage
         self.settings_sheet = "Settings"
+        # Merged settings from the last successful read; cleared after every write and expired by TTL
+        self._settings_cache: Optional[Dict[str, Any]] = None
+        self._settings_cached_at = 0.0
+        # Bumped by every clear, so a read that overlapped a write isn't cached
+        self._settings_generation = 0
         
         # Initialize settings sheet if it doesn't exist
         self._ensure_settings_sheet()
@@ -106,10 +115,17 @@ class SettingsService:
             logger.error(f"Error initializing settings sheet: {e}")
     
     def get_settings(self) -> Dict[str, Any]:
-        """Get all application settings as a dictionary"""
+        """Get all application settings as a dictionary (the Settings sheet is cached for
+        SETTINGS_CACHE_TTL_SECONDS)"""
+        cached = self._settings_cache
+        if cached is not None and time.monotonic() - self._settings_cached_at < SETTINGS_CACHE_TTL_SECONDS:
+            return dict(cached)
+        
+        generation = self._settings_generation
         try:
             # Start with default settings
             settings = self._get_default_settings()
+            storage_read = False
             
             # Try to read from storage
             try:
@@ -125,6 +141,7 @@ class SettingsService:
                             value = value.lower() == 'true'
                         
                         settings[key] = value
+                storage_read = True
             except Exception as e:
                 logger.warning(f"Could not read settings from storage: {e}")
             
@@ -136,7 +153,12 @@ class SettingsService:
                         value = value.lower() == 'true'
                     settings[key] = value
             
-            return settings
+            # Only a successful read is worth keeping (a failed one is retried next call), and
+            # only if no write finished while it ran
+            if storage_read and generation == self._settings_generation:
+                self._settings_cached_at = time.monotonic()
+                self._settings_cache = settings
+            return dict(settings)
             
         except Exception as e:
             logger.error(f"Error retrieving settings: {e}")
@@ -195,6 +217,9 @@ class SettingsService:
             self._memory_settings[setting_key] = str(setting_value)
             logger.info(f"Setting {setting_key} stored in memory as fallback")
             return True
+        finally:
+            # Only once the write is done; clearing first lets a concurrent read re-cache the old value
+            self.clear_settings_cache()
     
     def update_settings(self, settings_dict: Dict[str, Any], updated_by: str = 'user') -> bool:
         """Update multiple settings at once"""
@@ -230,6 +255,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"Error creating setting {setting_key}: {e}")
             raise
+        finally:
+            self.clear_settings_cache()
     
     def delete_setting(self, setting_key: str) -> bool:
         """Delete a setting (use with caution)"""
@@ -257,6 +284,8 @@ class SettingsService:
         except Exception as e:
             logger.error(f"Error deleting setting {setting_key}: {e}")
             raise
+        finally:
+            self.clear_settings_cache()
     
     def get_google_sheets_config(self) -> Dict[str, Any]:
         """Get Google Sheets specific configuration"""
@@ -424,6 +453,11 @@ class SettingsService:
             logger.error(f"Error importing settings: {e}")
             raise
     
+    def clear_settings_cache(self) -> None:
+        """Forget the cached settings so the next lookup re-reads storage"""
+        self._settings_generation += 1
+        self._settings_cache = None
+    
     def _get_default_settings(self) -> Dict[str, Any]:
         """Get default settings when none exist"""
         return {
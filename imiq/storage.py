@@ -4,9 +4,14 @@ Handles Excel and Google Sheets data persistence with concurrency safety
 """
 
 import pandas as pd
+import openpyxl
+import functools
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+import json
 import os
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Tuple
 import tempfile
 import shutil
 from filelock import FileLock
@@ -15,37 +20,185 @@ import logging
 
 try:
     import gspread
+    from gspread.utils import absolute_range_name
     from oauth2client.service_account import ServiceAccountCredentials
     GOOGLE_SHEETS_AVAILABLE = True
 except ImportError:
     GOOGLE_SHEETS_AVAILABLE = False
 
+try:
+    import pyarrow.parquet as pq  # parquet engine for the sheet sidecar cache
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Rust xlsx reader behind pandas' 'calamine' engine; pandas imports it itself, so only probe for it
+CALAMINE_AVAILABLE = find_spec('python_calamine') is not None
+
+try:
+    import orjson  # faster parser for service-account key files
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from .utils import get_ist_now, generate_id
 
 logger = logging.getLogger(__name__)
 
-class StorageBase:
+# Identifier/text columns read as strings so pandas skips type inference on them;
+# `str` keeps blank cells as nan (not pd.NA), so ==, bool() and .strip() callers still work
+ID_COLUMN_DTYPES = {
+    "user_id": str, "email": str, "password_hash": str, "role": str,
+    "order_id": str, "tracking_id": str, "courier_name": str
+}
+
+# Sheets and columns of CZ_MasterSheet.xlsx, shared by every storage backend
+DEFAULT_SHEETS: Dict[str, List[str]] = {
+    "Users": ["user_id", "email", "password_hash", "plain_password", "role", "name", "created_at", "is_active"],
+    "NewOrders": [
+        "order_id", "phone", "customer_name", "product", "quantity", "balance_to_pay",
+        "advance_paid", "total", "address", "city", "pincode", "payment_method",
+        "status", "timestamp", "ai_order_id", "tracking_id", "courier_name",
+        "created_by", "advance_screenshot", "PICKUP LOCATION", "Remarks", "Last Update Date"
+    ],
+    "Customers": [
+        "customer_id", "phone", "name", "email", "address", "city", "pincode", "created_at"
+    ],
+    "ProductList": [
+        "product_name", "price", "description", "stock", "category", "sku", "status", "image_url"
+    ],
+    "ChatLogs": [
+        "message_id", "phone", "message", "direction", "timestamp", "assigned_user",
+        "source", "message_id_dup", "status", "timestamp_dup", "ai_attempted",
+        "ai_success", "failure_reason"
+    ],
+    "ChatAssignments": [
+        "phone", "assigned_user", "assigned_at", "status"
+    ],
+    "Revenue": [
+        "date", "ad_spend", "courier_expenses", "other_expenses", "notes", "created_by", "timestamp"
+    ]
+}
+
+# Per-sheet write counter, bumped after every write; sheet caches (performance.get_cached_sheet_data)
+# include it in their key so a write moves readers onto a fresh entry
+_sheet_versions: Dict[str, int] = {}
+
+def get_sheet_version(sheet_name: str) -> int:
+    """Current write version of a sheet in this process (0 until its first write)"""
+    return _sheet_versions.get(sheet_name, 0)
+
+def bump_sheet_version(sheet_name: str) -> int:
+    """Mark a sheet as written so cached copies of it are no longer used"""
+    _sheet_versions[sheet_name] = get_sheet_version(sheet_name) + 1
+    return _sheet_versions[sheet_name]
+
+def _load_json(data) -> Any:
+    """Parse JSON text or bytes, using orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+@functools.lru_cache(maxsize=4)
+def _file_credentials(path: str, mtime_ns: int, scope: Tuple[str, ...]):
+    """Service-account credentials from a key file, parsed once per version of the file"""
+    with open(path, 'rb') as f:
+        return ServiceAccountCredentials.from_json_keyfile_dict(_load_json(f.read()), list(scope))
+
+def _read_excel_sheet(path: str, sheet_name: str, usecols: Optional[Callable] = None,
+                      dtype: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """Parse one sheet with calamine when it is installed, falling back to openpyxl"""
+    dtype = {**ID_COLUMN_DTYPES, **(dtype or {})}
+    if CALAMINE_AVAILABLE:
+        try:
+            return pd.read_excel(path, sheet_name=sheet_name, engine='calamine', usecols=usecols, dtype=dtype)
+        except ValueError:
+            # A missing sheet; openpyxl would only parse the workbook again to say the same
+            raise
+        except Exception as e:
+            logger.warning(f"calamine could not read {path}, falling back to openpyxl: {e}")
+    return pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl', usecols=usecols, dtype=dtype)
+
+def normalize_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """Store is_active as bool; sheets hold it as 'true'/'false' text or TRUE/FALSE cells,
+    and only an explicit false deactivates (a blank cell means active, as in create_account)"""
+    if 'is_active' in df.columns and df['is_active'].dtype != bool:
+        flags = df['is_active']
+        inactive = flags.eq(False) | flags.astype(str).str.strip().str.lower().eq('false')
+        df = df.assign(is_active=~inactive)
+    return df
+
+def project_columns(df: pd.DataFrame, usecols: Optional[List[str]] = None,
+                     dtype: Optional[Dict[str, Any]] = None, set_index: Optional[str] = None) -> pd.DataFrame:
+    """Apply read_sheet's usecols/dtype/set_index to a loaded frame, ignoring absent columns"""
+    if usecols is not None:
+        df = df[[col for col in df.columns if col in usecols]]
+    if dtype:
+        df = df.astype({col: col_type for col, col_type in dtype.items() if col in df.columns})
+    if set_index is not None and set_index in df.columns:
+        df = df.set_index(set_index)
+    return df
+
+def eq_mask(df: pd.DataFrame, column_eq: Dict[str, Any]) -> pd.Series:
+    """Boolean mask of rows whose columns equal every value in column_eq"""
+    mask = pd.Series(True, index=df.index)
+    for col, value in column_eq.items():
+        if col not in df.columns:
+            return pd.Series(False, index=df.index)
+        mask &= df[col].eq(value)
+    return mask
+
+def assign_where(df: pd.DataFrame, mask: pd.Series, set_values: Dict[str, Any]) -> pd.DataFrame:
+    """Set set_values on masked rows column-by-column, widening dtypes as needed"""
+    for col, value in set_values.items():
+        column = df[col].astype(object) if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        df[col] = column.mask(mask, value)
+    return df
+
+class StorageBase(ABC):
     """Abstract base class for storage implementations"""
     
+    @abstractmethod
     def ensure_workbook(self, required_sheets: Dict[str, List[str]]) -> None:
         """Ensure workbook exists with required sheets and columns"""
         raise NotImplementedError
     
-    def read_sheet(self, sheet_name: str) -> pd.DataFrame:
-        """Read a sheet and return as DataFrame"""
+    @abstractmethod
+    def read_sheet(self, sheet_name: str, usecols: Optional[List[str]] = None,
+                   dtype: Optional[Dict[str, Any]] = None, set_index: Optional[str] = None) -> pd.DataFrame:
+        """Read a sheet and return as DataFrame, optionally only `usecols` cast to `dtype`,
+        indexed by the `set_index` column"""
         raise NotImplementedError
     
+    def count_rows(self, sheet_name: str) -> int:
+        """Number of data rows in a sheet (header excluded); backends override with a cheaper probe"""
+        return len(self.read_sheet(sheet_name))
+    
+    @abstractmethod
     def append_row(self, sheet_name: str, row_data: Dict[str, Any]) -> None:
         """Append a single row to a sheet"""
         raise NotImplementedError
     
+    @abstractmethod
     def replace_sheet(self, sheet_name: str, df: pd.DataFrame) -> None:
         """Replace entire sheet content with DataFrame"""
         raise NotImplementedError
     
+    @abstractmethod
     def update_rows(self, sheet_name: str, filter_fn: Callable, update_fn: Callable) -> int:
         """Update rows matching filter function with update function"""
         raise NotImplementedError
+    
+    def update_where(self, sheet_name: str, column_eq: Dict[str, Any], set_values: Dict[str, Any]) -> int:
+        """Set `set_values` on rows whose columns equal `column_eq`; returns rows updated"""
+        def filter_fn(row):
+            return all(row.get(col) == value for col, value in column_eq.items())
+        
+        def update_fn(row):
+            row.update(set_values)
+            return row
+        
+        return self.update_rows(sheet_name, filter_fn, update_fn)
 
 class ExcelStorage(StorageBase):
     """Excel-based storage with file locking for concurrency safety"""
@@ -54,33 +207,7 @@ class ExcelStorage(StorageBase):
         self.file_path = file_path
         self.lock_path = f"{file_path}.lock"
         
-        # Define schema matching existing CZ_MasterSheet.xlsx
-        self.default_sheets = {
-            "Users": ["user_id", "email", "password_hash", "plain_password", "role", "name", "created_at", "is_active"],
-            "NewOrders": [
-                "order_id", "phone", "customer_name", "product", "quantity", "balance_to_pay", 
-                "advance_paid", "total", "address", "city", "pincode", "payment_method", 
-                "status", "timestamp", "ai_order_id", "tracking_id", "courier_name", 
-                "created_by", "advance_screenshot", "PICKUP LOCATION", "Remarks", "Last Update Date"
-            ],
-            "Customers": [
-                "customer_id", "phone", "name", "email", "address", "city", "pincode", "created_at"
-            ],
-            "ProductList": [
-                "product_name", "price", "description", "stock", "category", "sku", "status", "image_url"
-            ],
-            "ChatLogs": [
-                "message_id", "phone", "message", "direction", "timestamp", "assigned_user", 
-                "source", "message_id_dup", "status", "timestamp_dup", "ai_attempted", 
-                "ai_success", "failure_reason"
-            ],
-            "ChatAssignments": [
-                "phone", "assigned_user", "assigned_at", "status"
-            ],
-            "Revenue": [
-                "date", "ad_spend", "courier_expenses", "other_expenses", "notes", "created_by", "timestamp"
-            ]
-        }
+        self.default_sheets = DEFAULT_SHEETS
         
         # Verify existing workbook structure
         self.ensure_workbook(self.default_sheets)
@@ -108,19 +235,45 @@ class ExcelStorage(StorageBase):
         
         logger.info(f"Using existing workbook at {self.file_path}")
     
-    def read_sheet(self, sheet_name: str) -> pd.DataFrame:
-        """Read sheet with file locking"""
+    def read_sheet(self, sheet_name: str, usecols: Optional[List[str]] = None,
+                   dtype: Optional[Dict[str, Any]] = None, set_index: Optional[str] = None) -> pd.DataFrame:
+        """Read sheet with file locking, optionally only `usecols` cast to `dtype`"""
         with FileLock(self.lock_path):
             try:
-                df = pd.read_excel(self.file_path, sheet_name=sheet_name)
-                return df
+                df = self._read_sidecar(sheet_name, usecols)
+                if df is None and PARQUET_AVAILABLE:
+                    # Parse every column once so the sidecar can serve any projection
+                    df = _read_excel_sheet(self.file_path, sheet_name)
+                    self._write_sidecar(sheet_name, df)
+                elif df is None:
+                    wanted = (lambda col: col in usecols) if usecols is not None else None
+                    df = _read_excel_sheet(self.file_path, sheet_name, usecols=wanted, dtype=dtype)
+                return project_columns(normalize_flags(df), usecols, dtype, set_index)
             except Exception as e:
                 logger.error(f"Error reading sheet {sheet_name}: {e}")
                 # Return empty DataFrame with expected columns
                 if sheet_name in self.default_sheets:
-                    return pd.DataFrame(columns=self.default_sheets[sheet_name])
+                    return project_columns(pd.DataFrame(columns=self.default_sheets[sheet_name]), usecols, set_index=set_index)
                 raise
     
+    def count_rows(self, sheet_name: str) -> int:
+        """Count data rows from the sheet dimensions without parsing any cells"""
+        with FileLock(self.lock_path):
+            wb = openpyxl.load_workbook(self.file_path, read_only=True)
+            try:
+                if sheet_name not in wb.sheetnames:
+                    if sheet_name in self.default_sheets:
+                        return 0
+                    raise ValueError(f"Worksheet named '{sheet_name}' not found")
+                ws = wb[sheet_name]
+                max_row = ws.max_row
+                if max_row is None:
+                    # Workbook saved without a <dimension> record; fall back to walking rows
+                    max_row = sum(1 for _ in ws.iter_rows(values_only=True))
+                return max(max_row - 1, 0)
+            finally:
+                wb.close()
+    
     def append_row(self, sheet_name: str, row_data: Dict[str, Any]) -> None:
         """Append row with atomic write"""
         logger.info(f"Attempting to append row to sheet: {sheet_name}")
@@ -157,6 +310,7 @@ class ExcelStorage(StorageBase):
             # Atomic write
             logger.info("Starting atomic write to Excel file")
             self._atomic_write_excel(all_sheets)
+            bump_sheet_version(sheet_name)
             logger.info("Atomic write completed successfully")
     
     def replace_sheet(self, sheet_name: str, df: pd.DataFrame) -> None:
@@ -169,6 +323,7 @@ class ExcelStorage(StorageBase):
             
             all_sheets[sheet_name] = df
             self._atomic_write_excel(all_sheets)
+            bump_sheet_version(sheet_name)
     
     def update_rows(self, sheet_name: str, filter_fn: Callable, update_fn: Callable) -> int:
         """Update rows matching filter condition"""
@@ -179,6 +334,8 @@ class ExcelStorage(StorageBase):
                     return 0
                 
                 df = all_sheets[sheet_name]
+                if df.empty:
+                    return 0
                 
                 # Find matching rows
                 mask = df.apply(filter_fn, axis=1)
@@ -187,6 +344,9 @@ class ExcelStorage(StorageBase):
                 if len(matching_rows) == 0:
                     return 0
                 
+                # Blank columns load as float64, which pandas won't upcast on assignment
+                df = df.astype(object)
+                
                 # Apply update function
                 for idx in matching_rows.index:
                     row = df.loc[idx].to_dict()
@@ -196,6 +356,7 @@ class ExcelStorage(StorageBase):
                 
                 all_sheets[sheet_name] = df
                 self._atomic_write_excel(all_sheets)
+                bump_sheet_version(sheet_name)
                 
                 return len(matching_rows)
                 
@@ -203,6 +364,73 @@ class ExcelStorage(StorageBase):
                 logger.error(f"Error updating rows in {sheet_name}: {e}")
                 raise
     
+    def update_where(self, sheet_name: str, column_eq: Dict[str, Any], set_values: Dict[str, Any]) -> int:
+        """Update rows matching column equalities with a vectorized mask"""
+        with FileLock(self.lock_path):
+            try:
+                all_sheets = pd.read_excel(self.file_path, sheet_name=None)
+                if sheet_name not in all_sheets:
+                    return 0
+                
+                df = all_sheets[sheet_name]
+                mask = eq_mask(df, column_eq)
+                updated_count = int(mask.sum())
+                if updated_count == 0:
+                    return 0
+                
+                all_sheets[sheet_name] = assign_where(df, mask, set_values)
+                self._atomic_write_excel(all_sheets)
+                bump_sheet_version(sheet_name)
+                
+                return updated_count
+                
+            except Exception as e:
+                logger.error(f"Error updating rows in {sheet_name}: {e}")
+                raise
+    
+    def _sidecar_path(self, sheet_name: str) -> Path:
+        """Parquet cache file for a sheet, stored next to the workbook"""
+        workbook = Path(self.file_path)
+        return workbook.with_name(f"{workbook.stem}.{sheet_name}.parquet")
+    
+    def _read_sidecar(self, sheet_name: str, usecols: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Read sheet from its parquet sidecar if it is at least as new as the workbook"""
+        if not PARQUET_AVAILABLE:
+            return None
+        
+        sidecar = self._sidecar_path(sheet_name)
+        try:
+            if sidecar.stat().st_mtime_ns < os.stat(self.file_path).st_mtime_ns:
+                return None
+            columns = None
+            if usecols is not None:
+                columns = [col for col in pq.read_schema(sidecar).names if col in usecols]
+            return pd.read_parquet(sidecar, columns=columns)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sidecar {sidecar}: {e}")
+            return None
+    
+    def _write_sidecar(self, sheet_name: str, df: pd.DataFrame) -> None:
+        """Cache a freshly parsed sheet as parquet so later reads skip the xlsx parse"""
+        if not PARQUET_AVAILABLE:
+            return
+        
+        sidecar = self._sidecar_path(sheet_name)
+        try:
+            df.to_parquet(sidecar, index=False)
+        except Exception as e:
+            # Mixed-type object columns can't always be stored; keep reading from xlsx
+            logger.warning(f"Could not write sidecar for sheet {sheet_name}: {e}")
+            sidecar.unlink(missing_ok=True)
+    
+    def _clear_sidecars(self) -> None:
+        """Drop all parquet sidecars after the workbook has been rewritten"""
+        workbook = Path(self.file_path)
+        for sidecar in workbook.parent.glob(f"{workbook.stem}.*.parquet"):
+            sidecar.unlink(missing_ok=True)
+    
     def _atomic_write_excel(self, all_sheets: Dict[str, pd.DataFrame]) -> None:
         """Perform atomic write using temporary file"""
         temp_path = None
@@ -223,6 +451,7 @@ class ExcelStorage(StorageBase):
             logger.info(f"Moving temp file to final location: {self.file_path}")
             shutil.move(temp_path, self.file_path)
             temp_path = None  # Successfully moved, don't delete
+            self._clear_sidecars()
             logger.info("Atomic move completed successfully")
             
         except Exception as e:
@@ -243,33 +472,7 @@ class GoogleSheetsStorage(StorageBase):
         self.sheet_id = sheet_id
         self.credentials_path = credentials_path or os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
         
-        # Define schema matching existing CZ_MasterSheet.xlsx
-        self.default_sheets = {
-            "Users": ["user_id", "email", "password_hash", "plain_password", "role", "name", "created_at", "is_active"],
-            "NewOrders": [
-                "order_id", "phone", "customer_name", "product", "quantity", "balance_to_pay", 
-                "advance_paid", "total", "address", "city", "pincode", "payment_method", 
-                "status", "timestamp", "ai_order_id", "tracking_id", "courier_name", 
-                "created_by", "advance_screenshot", "PICKUP LOCATION", "Remarks", "Last Update Date"
-            ],
-            "Customers": [
-                "customer_id", "phone", "name", "email", "address", "city", "pincode", "created_at"
-            ],
-            "ProductList": [
-                "product_name", "price", "description", "stock", "category", "sku", "status", "image_url"
-            ],
-            "ChatLogs": [
-                "message_id", "phone", "message", "direction", "timestamp", "assigned_user", 
-                "source", "message_id_dup", "status", "timestamp_dup", "ai_attempted", 
-                "ai_success", "failure_reason"
-            ],
-            "ChatAssignments": [
-                "phone", "assigned_user", "assigned_at", "status"
-            ],
-            "Revenue": [
-                "date", "ad_spend", "courier_expenses", "other_expenses", "notes", "created_by", "timestamp"
-            ]
-        }
+        self.default_sheets = DEFAULT_SHEETS
         
         # Initialize Google Sheets client
         scope = [
@@ -283,14 +486,15 @@ class GoogleSheetsStorage(StorageBase):
             
             # Method 1: Direct JSON content from environment variable (preferred for deployment)
             if os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON'):
-                import json
-                service_account_info = json.loads(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON'))
+                service_account_info = _load_json(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON'))
                 credentials = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, scope)
                 logger.info("Using credentials from GOOGLE_SERVICE_ACCOUNT_JSON environment variable")
             
             # Method 2: File path (local development or deployment with file)
             elif self.credentials_path and os.path.exists(self.credentials_path):
-                credentials = ServiceAccountCredentials.from_json_keyfile_name(self.credentials_path, scope)
+                credentials = _file_credentials(
+                    self.credentials_path, os.stat(self.credentials_path).st_mtime_ns, tuple(scope)
+                )
                 logger.info(f"Using credentials from file: {self.credentials_path}")
             
             else:
@@ -339,31 +543,50 @@ class GoogleSheetsStorage(StorageBase):
             logger.error(f"Error ensuring Google Sheets workbook: {e}")
             raise
     
-    def read_sheet(self, sheet_name: str) -> pd.DataFrame:
-        """Read data from Google Sheet"""
+    def read_sheet(self, sheet_name: str, usecols: Optional[List[str]] = None,
+                   dtype: Optional[Dict[str, Any]] = None, set_index: Optional[str] = None) -> pd.DataFrame:
+        """Read data from Google Sheet, optionally only `usecols` cast to `dtype`"""
         try:
-            worksheet = self.spreadsheet.worksheet(sheet_name)
-            records = worksheet.get_all_records()
-            df = pd.DataFrame(records)
-            
-            # Clean data for specific sheets
-            if sheet_name == "NewOrders" and not df.empty:
-                # Convert numeric columns properly
-                numeric_columns = ['quantity', 'balance_to_pay', 'advance_paid', 'total']
-                for col in numeric_columns:
-                    if col in df.columns:
-                        # Convert to numeric, replacing empty strings and invalid values with 0
-                        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df = self._read_records(sheet_name)
             
             logger.info(f"Read {len(df)} rows from Google Sheet '{sheet_name}'")
-            return df
+            return project_columns(normalize_flags(df), usecols, dtype, set_index)
         except Exception as e:
             logger.error(f"Error reading Google Sheet '{sheet_name}': {e}")
             # Return empty DataFrame with expected columns if sheet doesn't exist
             if sheet_name in getattr(self, 'default_sheets', {}):
-                return pd.DataFrame(columns=self.default_sheets[sheet_name])
+                return project_columns(pd.DataFrame(columns=self.default_sheets[sheet_name]), usecols, set_index=set_index)
             raise
     
+    def _read_records(self, sheet_name: str) -> pd.DataFrame:
+        """Sheet cells as written, before read_sheet's is_active normalization"""
+        worksheet = self.spreadsheet.worksheet(sheet_name)
+        return self._clean_sheet(sheet_name, pd.DataFrame(worksheet.get_all_records()))
+    
+    def count_rows(self, sheet_name: str) -> int:
+        """Count data rows by fetching only column A instead of the whole sheet"""
+        try:
+            response = self.spreadsheet.values_get(
+                absolute_range_name(sheet_name, 'A2:A'),
+                params={'majorDimension': 'COLUMNS', 'valueRenderOption': 'UNFORMATTED_VALUE'}
+            )
+            columns = response.get('values', [])
+            return len(columns[0]) if columns else 0
+        except Exception as e:
+            logger.warning(f"Column count of '{sheet_name}' failed, reading the full sheet: {e}")
+            return super().count_rows(sheet_name)
+    
+    def _clean_sheet(self, sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Clean data for specific sheets"""
+        if sheet_name == "NewOrders" and not df.empty:
+            # Convert numeric columns properly
+            numeric_columns = ['quantity', 'balance_to_pay', 'advance_paid', 'total']
+            for col in numeric_columns:
+                if col in df.columns:
+                    # Convert to numeric, replacing empty strings and invalid values with 0
+                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        return df
+    
     def append_row(self, sheet_name: str, row_data: Dict[str, Any]) -> None:
         """Append row to Google Sheet"""
         try:
@@ -382,6 +605,7 @@ class GoogleSheetsStorage(StorageBase):
             # Append the row
             worksheet.append_row(row_values)
             logger.info(f"Appended row to Google Sheet '{sheet_name}'")
+            bump_sheet_version(sheet_name)
             
         except Exception as e:
             logger.error(f"Error appending to Google Sheet '{sheet_name}': {e}")
@@ -426,6 +650,7 @@ class GoogleSheetsStorage(StorageBase):
             
             # Update the sheet
             worksheet.update(data_to_update)
+            bump_sheet_version(sheet_name)
             logger.info(f"Replaced Google Sheet '{sheet_name}' with {len(df)} rows")
             
         except Exception as e:
@@ -435,8 +660,8 @@ class GoogleSheetsStorage(StorageBase):
     def update_rows(self, sheet_name: str, filter_fn: Callable, update_fn: Callable) -> int:
         """Update rows in Google Sheet"""
         try:
-            # Read current data
-            df = self.read_sheet(sheet_name)
+            # Read current data as stored, so untouched cells are written back unchanged
+            df = self._read_records(sheet_name)
             
             if df.empty:
                 return 0
@@ -476,7 +701,7 @@ def get_storage_instance(settings_service=None) -> StorageBase:
     # Always prefer Google Sheets if secret is present
     if "GOOGLE_SERVICE_ACCOUNT" in st.secrets:
         try:
-            info = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
+            info = _load_json(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
             import os
             # Set environment variable for downstream usage
             os.environ['GOOGLE_SERVICE_ACCOUNT_JSON'] = json.dumps(info)
@@ -0,0 +1,103 @@
+"""
+IMIQ In-Memory Storage
+Keeps every sheet as a pandas DataFrame; used by tests that don't need an on-disk workbook
+"""
+
+import pandas as pd
+import threading
+from typing import Dict, List, Any, Optional, Callable
+import logging
+
+from .storage import StorageBase, DEFAULT_SHEETS, bump_sheet_version, normalize_flags, project_columns, eq_mask, assign_where
+
+logger = logging.getLogger(__name__)
+
+class MemoryStorage(StorageBase):
+    """Dict-of-DataFrames storage with the same contract as ExcelStorage"""
+
+    def __init__(self):
+        self._sheets: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+        self.default_sheets = DEFAULT_SHEETS
+
+        self.ensure_workbook(self.default_sheets)
+
+    def ensure_workbook(self, required_sheets: Dict[str, List[str]]) -> None:
+        """Create any missing sheet as an empty frame with the required columns"""
+        with self._lock:
+            for sheet_name, required_cols in required_sheets.items():
+                if sheet_name not in self._sheets:
+                    self._sheets[sheet_name] = pd.DataFrame(columns=required_cols)
+
+    def read_sheet(self, sheet_name: str, usecols: Optional[List[str]] = None,
+                   dtype: Optional[Dict[str, Any]] = None, set_index: Optional[str] = None) -> pd.DataFrame:
+        """Return a copy of the sheet, optionally only `usecols` cast to `dtype`"""
+        with self._lock:
+            if sheet_name in self._sheets:
+                df = self._sheets[sheet_name].copy()
+            elif sheet_name in self.default_sheets:
+                df = pd.DataFrame(columns=self.default_sheets[sheet_name])
+            else:
+                logger.error(f"Sheet {sheet_name} not found in memory storage")
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return project_columns(normalize_flags(df), usecols, dtype, set_index)
+
+    def count_rows(self, sheet_name: str) -> int:
+        """Number of rows held for a sheet, without copying it"""
+        with self._lock:
+            if sheet_name in self._sheets:
+                return len(self._sheets[sheet_name])
+        if sheet_name in self.default_sheets:
+            return 0
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    def append_row(self, sheet_name: str, row_data: Dict[str, Any]) -> None:
+        """Append a single row to a sheet"""
+        with self._lock:
+            df = self._sheets.get(sheet_name)
+            if df is None:
+                df = pd.DataFrame(columns=self.default_sheets.get(sheet_name, list(row_data.keys())))
+            self._sheets[sheet_name] = pd.concat([df, pd.DataFrame([row_data])], ignore_index=True)
+        bump_sheet_version(sheet_name)
+
+    def replace_sheet(self, sheet_name: str, df: pd.DataFrame) -> None:
+        """Replace entire sheet content"""
+        with self._lock:
+            self._sheets[sheet_name] = df.reset_index(drop=True).copy()
+        bump_sheet_version(sheet_name)
+
+    def update_rows(self, sheet_name: str, filter_fn: Callable, update_fn: Callable) -> int:
+        """Update rows matching filter condition"""
+        with self._lock:
+            df = self._sheets.get(sheet_name)
+            if df is None or df.empty:
+                return 0
+
+            mask = df.apply(filter_fn, axis=1)
+            matching_rows = df.loc[mask]
+
+            for idx in matching_rows.index:
+                updated_row = update_fn(df.loc[idx].to_dict())
+                for col, value in updated_row.items():
+                    df.loc[idx, col] = value
+
+        if len(matching_rows):
+            bump_sheet_version(sheet_name)
+        return len(matching_rows)
+
+    def update_where(self, sheet_name: str, column_eq: Dict[str, Any], set_values: Dict[str, Any]) -> int:
+        """Update rows matching column equalities with a vectorized mask"""
+        with self._lock:
+            df = self._sheets.get(sheet_name)
+            if df is None:
+                return 0
+
+            mask = eq_mask(df, column_eq)
+            updated_count = int(mask.sum())
+            if updated_count:
+                self._sheets[sheet_name] = assign_where(df, mask, set_values)
+
+        if updated_count:
+            bump_sheet_version(sheet_name)
+        return updated_count
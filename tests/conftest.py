@@ -0,0 +1,97 @@
+"""
+Shared pytest configuration for IMIQ tests
+"""
+
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from filelock import FileLock
+
+from imiq.storage import ExcelStorage
+from imiq.storage_memory import MemoryStorage
+from imiq.utils import get_ist_now
+
+# Users columns AuthService reads and writes
+SEED_USER_COLUMNS = ["user_id", "email", "password_hash", "plain_password", "role", "name", "created_at", "is_active"]
+
+
+def _write_blank_workbook(path, sheets):
+    """Write an xlsx with one header-only sheet per {sheet_name: columns} entry"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet_name, columns in sheets.items():
+            pd.DataFrame(columns=columns).to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+@pytest.fixture(scope="session")
+def write_blank_workbook():
+    """ExcelStorage only opens existing workbooks, so fixtures lay down the schema first"""
+    return _write_blank_workbook
+
+
+@pytest.fixture(scope="module", params=["memory", "excel"])
+def temp_storage(request, tmp_path_factory, write_blank_workbook):
+    """Create one storage instance per backend, shared by every test in the requesting module"""
+    memory_storage = MemoryStorage()
+    if request.param == "memory":
+        return memory_storage
+    
+    # pytest owns the directory and prunes old ones under its retention policy
+    temp_dir = tmp_path_factory.mktemp("storage")
+    write_blank_workbook(temp_dir / "test_db.xlsx", memory_storage.default_sheets)
+    storage = ExcelStorage(str(temp_dir / "test_db.xlsx"))
+    
+    # Keep the freshly created workbook so tests can be reset without rebuilding it
+    shutil.copyfile(storage.file_path, temp_dir / "pristine.xlsx")
+    return storage
+
+
+@pytest.fixture(autouse=True)
+def reset_sheets(request):
+    """Restore the shared workbook to its initial contents before each test that uses it"""
+    if "temp_storage" in request.fixturenames:
+        storage = request.getfixturevalue("temp_storage")
+        if isinstance(storage, MemoryStorage):
+            # Drop sheets a test added too, as the pristine workbook copy does
+            storage._sheets.clear()
+            storage.ensure_workbook(storage.default_sheets)
+        else:
+            pristine = os.path.join(os.path.dirname(storage.file_path), "pristine.xlsx")
+            with FileLock(storage.lock_path):
+                shutil.copyfile(pristine, storage.file_path)
+                storage._clear_sidecars()
+    yield
+
+
+def _seed_users(storage, users):
+    """Append (user_id, email, password, role) rows to Users with a single write,
+    stored the way AuthService.create_account stores them"""
+    created_at = get_ist_now().isoformat()
+    new_rows = pd.DataFrame(
+        [
+            (user_id, email, "", password, role.lower(), user_id, created_at, True)
+            for user_id, email, password, role in users
+        ],
+        columns=SEED_USER_COLUMNS
+    )
+    existing = storage.read_sheet("Users")
+    storage.replace_sheet("Users", pd.concat([existing, new_rows], ignore_index=True))
+
+
+@pytest.fixture
+def seed_users():
+    """Seed several users at once instead of one create_account round-trip each"""
+    return _seed_users
+
+
+def _find_user(storage, key, by="user_id"):
+    """Users row whose `by` column equals key, via an indexed lookup; None if absent"""
+    users = storage.read_sheet("Users", set_index=by)
+    return users.loc[key] if key in users.index else None
+
+
+@pytest.fixture
+def find_user():
+    """Look up a single Users row by user_id (or another column) without scanning"""
+    return _find_user
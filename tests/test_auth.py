@@ -4,76 +4,119 @@ Testing user authentication, registration, and session management
 """
 
 import pytest
-import bcrypt
-import tempfile
-import os
-from unittest.mock import patch, MagicMock
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 
 from imiq.auth import AuthService
-from imiq.storage import ExcelStorage
-from imiq.utils import get_ist_now
+
+
+class _SessionState(dict):
+    """Dict with attribute access, like st.session_state"""
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+    __delattr__ = dict.__delitem__
 
 
 class TestAuthService:
     """Test cases for AuthService class"""
     
-    @pytest.fixture
-    def temp_storage(self):
-        """Create temporary storage instance for testing"""
-        temp_dir = tempfile.mkdtemp()
-        temp_file = os.path.join(temp_dir, "test_auth_db.xlsx")
-        storage = ExcelStorage(temp_file)
-        yield storage
-        
-        # Cleanup
-        try:
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
-            os.rmdir(temp_dir)
-        except:
-            pass
-    
     @pytest.fixture
     def auth_service(self, temp_storage):
         """Create AuthService instance with temporary storage"""
         return AuthService(temp_storage)
     
     @pytest.fixture(autouse=True)
-    def clear_streamlit_session(self):
+    def clear_streamlit_session(self, monkeypatch):
         """Clear streamlit session state before each test"""
         # Mock streamlit session_state
-        with patch.object(st, 'session_state', {}):
-            yield
+        monkeypatch.setattr(st, 'session_state', _SessionState())
     
-    def test_create_account_success(self, auth_service):
+    def test_create_account_success(self, auth_service, find_user):
         """Test successful account creation"""
         result = auth_service.create_account(
             email="testuser@example.com",
-            userid="testuser123",
+            user_id="testuser123",
             password="securepassword",
             role="User"
         )
         
-        assert result is True
+        assert result['email'] == "testuser@example.com"
         
         # Verify user was created
-        users_df = auth_service.storage.read_sheet("Users")
-        test_user = users_df[users_df['email'] == 'testuser@example.com']
-        assert not test_user.empty
-        assert test_user.iloc[0]['userid'] == 'testuser123'
-        assert test_user.iloc[0]['role'] == 'User'
+        test_user = find_user(auth_service.storage, 'testuser@example.com', by='email')
+        assert test_user is not None
+        assert test_user['user_id'] == 'testuser123'
+        assert test_user['role'] == 'user'
+        
+        # Passwords are stored as plain text; the hash column stays empty
+        assert test_user['plain_password'] == "securepassword"
+        assert pd.isna(test_user['password_hash']) or test_user['password_hash'] == ""
         
-        # Verify password was hashed
-        stored_hash = test_user.iloc[0]['password_hash']
-        assert bcrypt.checkpw("securepassword".encode('utf-8'), stored_hash.encode('utf-8'))
+        # The returned record is the row that was written
+        for column in ('user_id', 'plain_password', 'role', 'name', 'created_at'):
+            assert result[column] == test_user[column]
+    
+    def test_create_account_uses_given_created_at(self, auth_service):
+        """Test a caller-supplied created_at is stored instead of the current time"""
+        created_at = "2024-01-01T09:30:00+05:30"
+        result = auth_service.create_account(
+            user_id="stampeduser",
+            password="securepassword",
+            email="stamped@example.com",
+            created_at=created_at
+        )
+        
+        assert result['created_at'] == created_at
+        users = auth_service.storage.read_sheet("Users", set_index='user_id')
+        assert users.at['stampeduser', 'created_at'] == created_at
+    
+    def test_create_account_sees_users_written_elsewhere(self, auth_service):
+        """Test uniqueness is checked against Users itself, including rows another writer added"""
+        auth_service.create_account(user_id="firstuser", password="securepassword", email="first@example.com")
+        
+        # Another process (or a direct sheet edit) adds a user this AuthService never saw
+        auth_service.storage.append_row("Users", {"user_id": "otheruser", "email": "other@example.com"})
+        
+        with pytest.raises(ValueError, match="User ID already taken"):
+            auth_service.create_account(user_id="otheruser", password="securepassword")
+        with pytest.raises(ValueError, match="Email already registered"):
+            auth_service.create_account(user_id="thirduser", password="securepassword", email="other@example.com")
+    
+    def test_concurrent_create_account_same_user_id(self, auth_service):
+        """Test only one of several simultaneous registrations of a user_id succeeds"""
+        def register(i):
+            try:
+                auth_service.create_account(user_id="raceuser", password="securepassword")
+                return True
+            except ValueError:
+                return False
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(register, range(4)))
+        
+        assert results.count(True) == 1
+        users = auth_service.storage.read_sheet("Users")
+        assert (users['user_id'] == "raceuser").sum() == 1
+    
+    def test_create_and_authenticate_takes_create_account_order(self, auth_service):
+        """Test create_and_authenticate takes role, name, email positionally like create_account"""
+        result = auth_service.create_and_authenticate(
+            "newadmin", "password123", "Admin", "New Admin", "newadmin@example.com"
+        )
+        
+        assert result['success'] is True
+        assert result['user']['role'] == 'admin'
+        assert result['user']['name'] == 'New Admin'
+        assert result['user']['email'] == 'newadmin@example.com'
+        assert auth_service.authenticate("newadmin", "password123") == result['user']
     
     def test_create_account_duplicate_email(self, auth_service):
         """Test account creation with duplicate email fails"""
         # Create first account
         auth_service.create_account(
             email="duplicate@example.com",
-            userid="user1",
+            user_id="user1",
             password="password123"
         )
         
@@ -81,7 +124,7 @@ class TestAuthService:
         with pytest.raises(ValueError, match="Email already registered"):
             auth_service.create_account(
                 email="duplicate@example.com",
-                userid="user2",
+                user_id="user2",
                 password="password123"
             )
     
@@ -90,7 +133,7 @@ class TestAuthService:
         # Create first account
         auth_service.create_account(
             email="user1@example.com",
-            userid="duplicateid",
+            user_id="duplicateid",
             password="password123"
         )
         
@@ -98,7 +141,7 @@ class TestAuthService:
         with pytest.raises(ValueError, match="User ID already taken"):
             auth_service.create_account(
                 email="user2@example.com",
-                userid="duplicateid",
+                user_id="duplicateid",
                 password="password123"
             )
     
@@ -107,7 +150,7 @@ class TestAuthService:
         with pytest.raises(ValueError, match="Invalid email format"):
             auth_service.create_account(
                 email="invalid-email",
-                userid="testuser",
+                user_id="testuser",
                 password="password123"
             )
     
@@ -116,7 +159,7 @@ class TestAuthService:
         with pytest.raises(ValueError, match="Password must be at least 6 characters"):
             auth_service.create_account(
                 email="test@example.com",
-                userid="testuser",
+                user_id="testuser",
                 password="12345"  # Only 5 characters
             )
     
@@ -125,7 +168,7 @@ class TestAuthService:
         with pytest.raises(ValueError, match="Invalid role"):
             auth_service.create_account(
                 email="test@example.com",
-                userid="testuser",
+                user_id="testuser",
                 password="password123",
                 role="InvalidRole"
             )
@@ -135,101 +178,122 @@ class TestAuthService:
         # Create test account
         auth_service.create_account(
             email="auth@example.com",
-            userid="authuser",
+            user_id="authuser",
             password="testpassword123",
             role="Admin"
         )
         
         # Authenticate
-        user = auth_service.authenticate("auth@example.com", "testpassword123")
+        user = auth_service.authenticate("authuser", "testpassword123")
         
         assert user is not None
         assert user['email'] == "auth@example.com"
-        assert user['userid'] == "authuser"
-        assert user['role'] == "Admin"
+        assert user['user_id'] == "authuser"
+        assert user['role'] == "admin"
         assert 'created_at' in user
+        assert 'plain_password' not in user
     
     def test_authenticate_wrong_password(self, auth_service):
         """Test authentication with wrong password fails"""
         # Create test account
         auth_service.create_account(
             email="auth@example.com",
-            userid="authuser",
+            user_id="authuser",
             password="correctpassword"
         )
         
         # Try to authenticate with wrong password
-        user = auth_service.authenticate("auth@example.com", "wrongpassword")
+        user = auth_service.authenticate("authuser", "wrongpassword")
         assert user is None
     
+    def test_authenticate_shares_cache_across_threads(self, temp_storage):
+        """Test concurrent sign-ins and cache clears on one shared AuthService don't interfere"""
+        auth_service = AuthService(temp_storage, cache_auth_results=True)
+        auth_service.create_account(user_id="threaduser", password="threadpassword")
+        
+        def sign_in(i):
+            if i % 4 == 0:
+                auth_service.clear_auth_cache()
+            return auth_service.authenticate("threaduser", "threadpassword" if i % 2 else "wrongpassword")
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(sign_in, range(64)))
+        
+        assert all((user is not None) == bool(i % 2) for i, user in enumerate(results))
+    
+    def test_authenticate_sees_password_change_from_another_service(self, auth_service, temp_storage):
+        """Test a password changed through another AuthService takes effect immediately"""
+        auth_service.create_account(user_id="cacheu", password="oldpass1")
+        assert auth_service.authenticate("cacheu", "oldpass1") is not None
+        
+        assert AuthService(temp_storage).change_password("cacheu", "oldpass1", "newpass1")
+        
+        assert auth_service.authenticate("cacheu", "oldpass1") is None
+        assert auth_service.authenticate("cacheu", "newpass1") is not None
+    
     def test_authenticate_nonexistent_user(self, auth_service):
         """Test authentication with non-existent user fails"""
-        user = auth_service.authenticate("nonexistent@example.com", "password123")
+        user = auth_service.authenticate("nonexistent", "password123")
         assert user is None
     
-    @patch('streamlit.session_state', {})
-    def test_login_success(self, auth_service):
+    def test_login_success(self, auth_service, monkeypatch):
         """Test successful login sets session state"""
         # Create test account
         auth_service.create_account(
             email="login@example.com",
-            userid="loginuser",
+            user_id="loginuser",
             password="loginpassword"
         )
         
         # Mock streamlit session_state
-        mock_session = {}
-        with patch.object(st, 'session_state', mock_session):
-            result = auth_service.login("login@example.com", "loginpassword")
-            
-            assert result is True
-            assert mock_session['authenticated'] is True
-            assert mock_session['user']['email'] == "login@example.com"
-            assert mock_session['user']['userid'] == "loginuser"
-            assert 'login_time' in mock_session['user']
-    
-    @patch('streamlit.session_state', {})
-    def test_login_failure(self, auth_service):
+        mock_session = _SessionState()
+        monkeypatch.setattr(st, 'session_state', mock_session)
+        result = auth_service.login("loginuser", "loginpassword")
+        
+        assert result is True
+        assert mock_session['authenticated'] is True
+        assert mock_session['user']['email'] == "login@example.com"
+        assert mock_session['user']['user_id'] == "loginuser"
+        assert 'login_time' in mock_session['user']
+    
+    def test_login_failure(self, auth_service, monkeypatch):
         """Test failed login does not set session state"""
-        mock_session = {}
-        with patch.object(st, 'session_state', mock_session):
-            result = auth_service.login("nonexistent@example.com", "wrongpassword")
-            
-            assert result is False
-            assert 'authenticated' not in mock_session
-            assert 'user' not in mock_session
-    
-    @patch('streamlit.session_state', {'authenticated': True, 'user': {'userid': 'testuser'}})
-    def test_logout_clears_session(self, auth_service):
+        mock_session = _SessionState()
+        monkeypatch.setattr(st, 'session_state', mock_session)
+        result = auth_service.login("nonexistent", "wrongpassword")
+        
+        assert result is False
+        assert 'authenticated' not in mock_session
+        assert 'user' not in mock_session
+    
+    def test_logout_clears_session(self, auth_service, monkeypatch):
         """Test logout clears session state"""
-        mock_session = {'authenticated': True, 'user': {'userid': 'testuser'}}
+        mock_session = _SessionState(authenticated=True, user={'user_id': 'testuser'})
+        
+        monkeypatch.setattr(st, 'session_state', mock_session)
+        auth_service.logout()
         
-        with patch.object(st, 'session_state', mock_session):
-            auth_service.logout()
-            
-            assert 'authenticated' not in mock_session
-            assert 'user' not in mock_session
+        assert 'authenticated' not in mock_session
+        assert 'user' not in mock_session
     
-    @patch('streamlit.session_state', {'authenticated': True, 'user': {'userid': 'user1', 'role': 'User'}})
-    def test_get_current_user(self, auth_service):
+    def test_get_current_user(self, auth_service, monkeypatch):
         """Test getting current user from session"""
-        mock_session = {'authenticated': True, 'user': {'userid': 'user1', 'role': 'User'}}
+        mock_session = _SessionState(authenticated=True, user={'user_id': 'user1', 'role': 'User'})
+        
+        monkeypatch.setattr(st, 'session_state', mock_session)
+        user = auth_service.get_current_user()
         
-        with patch.object(st, 'session_state', mock_session):
-            user = auth_service.get_current_user()
-            
-            assert user is not None
-            assert user['userid'] == 'user1'
-            assert user['role'] == 'User'
+        assert user is not None
+        assert user['user_id'] == 'user1'
+        assert user['role'] == 'User'
     
-    @patch('streamlit.session_state', {})
-    def test_get_current_user_not_authenticated(self, auth_service):
+    def test_get_current_user_not_authenticated(self, auth_service, monkeypatch):
         """Test getting current user when not authenticated returns None"""
-        mock_session = {}
+        mock_session = _SessionState()
         
-        with patch.object(st, 'session_state', mock_session):
-            user = auth_service.get_current_user()
-            assert user is None
+        monkeypatch.setattr(st, 'session_state', mock_session)
+        user = auth_service.get_current_user()
+        assert user is None
     
     def test_is_admin_true(self, auth_service):
         """Test is_admin returns True for admin user"""
@@ -245,12 +309,12 @@ class TestAuthService:
         """Test is_admin returns False for None user"""
         assert auth_service.is_admin(None) is False
     
-    def test_update_user_role_success(self, auth_service):
+    def test_update_user_role_success(self, auth_service, find_user):
         """Test successful user role update"""
         # Create test user
         auth_service.create_account(
             email="roletest@example.com",
-            userid="roleuser",
+            user_id="roleuser",
             password="password123",
             role="User"
         )
@@ -260,10 +324,9 @@ class TestAuthService:
         assert result is True
         
         # Verify role was updated
-        users_df = auth_service.storage.read_sheet("Users")
-        updated_user = users_df[users_df['userid'] == 'roleuser']
-        assert not updated_user.empty
-        assert updated_user.iloc[0]['role'] == 'Admin'
+        updated_user = find_user(auth_service.storage, 'roleuser')
+        assert updated_user is not None
+        assert updated_user['role'] == 'admin'
     
     def test_update_user_role_invalid_role(self, auth_service):
         """Test user role update with invalid role fails"""
@@ -280,7 +343,7 @@ class TestAuthService:
         # Create test user
         auth_service.create_account(
             email="pwchange@example.com",
-            userid="pwuser",
+            user_id="pwuser",
             password="oldpassword123"
         )
         
@@ -289,11 +352,11 @@ class TestAuthService:
         assert result is True
         
         # Verify new password works
-        user = auth_service.authenticate("pwchange@example.com", "newpassword456")
+        user = auth_service.authenticate("pwuser", "newpassword456")
         assert user is not None
         
         # Verify old password no longer works
-        user = auth_service.authenticate("pwchange@example.com", "oldpassword123")
+        user = auth_service.authenticate("pwuser", "oldpassword123")
         assert user is None
     
     def test_change_password_wrong_old_password(self, auth_service):
@@ -301,7 +364,7 @@ class TestAuthService:
         # Create test user
         auth_service.create_account(
             email="pwfail@example.com",
-            userid="pwfailuser",
+            user_id="pwfailuser",
             password="correctpassword"
         )
         
@@ -314,7 +377,7 @@ class TestAuthService:
         # Create test user
         auth_service.create_account(
             email="pwshort@example.com",
-            userid="pwshortuser",
+            user_id="pwshortuser",
             password="correctpassword"
         )
         
@@ -322,11 +385,13 @@ class TestAuthService:
         with pytest.raises(ValueError, match="New password must be at least 6 characters"):
             auth_service.change_password("pwshortuser", "correctpassword", "12345")
     
-    def test_get_all_users_excludes_password_hash(self, auth_service):
+    def test_get_all_users_excludes_password_hash(self, auth_service, seed_users):
         """Test get_all_users excludes password hash column"""
         # Create test users
-        auth_service.create_account("user1@test.com", "user1", "password123")
-        auth_service.create_account("user2@test.com", "user2", "password456")
+        seed_users(auth_service.storage, [
+            ("user1", "user1@test.com", "password123", "User"),
+            ("user2", "user2@test.com", "password456", "User"),
+        ])
         
         # Get all users
         users_df = auth_service.get_all_users()
@@ -334,56 +399,41 @@ class TestAuthService:
         assert not users_df.empty
         assert 'password_hash' not in users_df.columns
         assert 'email' in users_df.columns
-        assert 'userid' in users_df.columns
+        assert 'user_id' in users_df.columns
         assert 'role' in users_df.columns
     
-    def test_get_user_stats(self, auth_service):
+    def test_get_user_stats(self, auth_service, seed_users):
         """Test getting user statistics"""
         # Create test users with different roles
-        auth_service.create_account("admin1@test.com", "admin1", "password", "Admin")
-        auth_service.create_account("user1@test.com", "user1", "password", "User")
-        auth_service.create_account("user2@test.com", "user2", "password", "User")
+        seed_users(auth_service.storage, [
+            ("admin1", "admin1@test.com", "password", "Admin"),
+            ("user1", "user1@test.com", "password", "User"),
+            ("user2", "user2@test.com", "password", "User"),
+        ])
         
         stats = auth_service.get_user_stats()
         
-        assert stats['total_users'] >= 3  # Including default admin
-        assert stats['admin_count'] >= 2  # Including default admin + test admin
-        assert stats['user_count'] >= 2  # Test users
-        assert 'recent_registrations' in stats
-
-
-@pytest.fixture
-def mock_bcrypt():
-    """Mock bcrypt for testing without actual hashing"""
-    with patch('imiq.auth.bcrypt') as mock:
-        # Mock hashpw to return a predictable hash
-        mock.hashpw.return_value = b'mocked_hash'
-        # Mock checkpw to return True for correct password
-        mock.checkpw.return_value = True
-        yield mock
-
-
-def test_password_hashing_integration(auth_service):
-    """Integration test for password hashing"""
-    # Create account
-    auth_service.create_account(
-        email="hashtest@example.com",
-        userid="hashuser",
-        password="testpassword123"
-    )
-    
-    # Verify the stored hash is different from the original password
-    users_df = auth_service.storage.read_sheet("Users")
-    user_row = users_df[users_df['userid'] == 'hashuser']
-    stored_hash = user_row.iloc[0]['password_hash']
-    
-    # Hash should not equal original password
-    assert stored_hash != "testpassword123"
-    
-    # But authentication should work
-    user = auth_service.authenticate("hashtest@example.com", "testpassword123")
-    assert user is not None
+        # The workbook starts with no users, so the counts are exact
+        assert stats['total_users'] == 3
+        assert stats['admin_count'] == 1
+        assert stats['user_count'] == 2
+        assert stats['recent_registrations'] == 3
 
+    
+    def test_password_stored_as_plain_text(self, auth_service, find_user):
+        """Test the password is kept in plain_password and checked against it"""
+        auth_service.create_account(
+            email="plaintest@example.com",
+            user_id="plainuser",
+            password="testpassword123"
+        )
+        
+        stored_user = find_user(auth_service.storage, 'plainuser')
+        assert stored_user['plain_password'] == "testpassword123"
+        
+        user = auth_service.authenticate("plainuser", "testpassword123")
+        assert user is not None
+        assert auth_service.authenticate("plainuser", "testpassword12") is None
 
 if __name__ == "__main__":
     # Run tests with pytest
@@ -0,0 +1,80 @@
+"""
+Tests for IMIQ Bootstrap
+Testing that app sessions are shared per workbook and storage secrets
+"""
+
+import pytest
+import streamlit
+
+from imiq import bootstrap
+from imiq.storage_memory import MemoryStorage
+
+
+SHEETS_SECRETS = {"GOOGLE_SERVICE_ACCOUNT": '{"type": "service_account"}', "GOOGLE_SHEET_ID": "sheet123"}
+
+
+@pytest.fixture
+def app_session_env(tmp_path, monkeypatch, write_blank_workbook):
+    """Blank master workbook, no Streamlit secrets, and storage selection stubbed out;
+    yields (workbook path, list of settings services storage was built for)"""
+    excel_path = str(tmp_path / "master.xlsx")
+    write_blank_workbook(excel_path, MemoryStorage().default_sheets)
+    for key in ('GOOGLE_APPLICATION_CREDENTIALS', 'GOOGLE_SERVICE_ACCOUNT_JSON'):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setattr(streamlit, 'secrets', {})
+    builds = []
+    
+    def fake_storage_instance(settings_service):
+        # Like get_storage_instance, publish the secret to the env on the Sheets path
+        if "GOOGLE_SERVICE_ACCOUNT" in streamlit.secrets:
+            monkeypatch.setenv('GOOGLE_SERVICE_ACCOUNT_JSON', streamlit.secrets["GOOGLE_SERVICE_ACCOUNT"])
+        builds.append(settings_service)
+        return MemoryStorage()
+    
+    monkeypatch.setattr(bootstrap, 'get_storage_instance', fake_storage_instance)
+    bootstrap._build_app_session.cache_clear()
+    yield excel_path, builds
+    bootstrap._build_app_session.cache_clear()
+
+
+def test_get_app_session_reused_for_same_workbook(app_session_env):
+    """Test repeated calls for one workbook share one session"""
+    excel_path, builds = app_session_env
+    
+    assert bootstrap.get_app_session(excel_path) is bootstrap.get_app_session(excel_path)
+    assert len(builds) == 1
+
+
+def test_get_app_session_shared_across_credentials_env(app_session_env, monkeypatch):
+    """Test the verify scripts' differing GOOGLE_APPLICATION_CREDENTIALS don't split the session,
+    since storage selection doesn't read it"""
+    excel_path, builds = app_session_env
+    default_session = bootstrap.get_app_session(excel_path)
+    
+    monkeypatch.setenv('GOOGLE_APPLICATION_CREDENTIALS', '/path/to/service_account.json')
+    
+    assert bootstrap.get_app_session(excel_path) is default_session
+    assert len(builds) == 1
+
+
+def test_get_app_session_reused_with_sheets_secrets(app_session_env, monkeypatch):
+    """Test the Sheets path, which sets GOOGLE_SERVICE_ACCOUNT_JSON while building, is built once"""
+    excel_path, builds = app_session_env
+    monkeypatch.setattr(streamlit, 'secrets', dict(SHEETS_SECRETS))
+    
+    first = bootstrap.get_app_session(excel_path)
+    
+    assert bootstrap.get_app_session(excel_path) is first
+    assert len(builds) == 1
+
+
+def test_get_app_session_rebuilt_for_other_sheet(app_session_env, monkeypatch):
+    """Test pointing the secrets at another Sheet builds a new session"""
+    excel_path, builds = app_session_env
+    monkeypatch.setattr(streamlit, 'secrets', dict(SHEETS_SECRETS))
+    first = bootstrap.get_app_session(excel_path)
+    
+    monkeypatch.setattr(streamlit, 'secrets', {**SHEETS_SECRETS, "GOOGLE_SHEET_ID": "sheet456"})
+    
+    assert bootstrap.get_app_session(excel_path) is not first
+    assert len(builds) == 2
@@ -0,0 +1,89 @@
+"""
+Tests for IMIQ script utilities
+Testing the helpers shared by the verify scripts
+"""
+
+import pytest
+import pandas as pd
+
+from imiq import script_utils
+from imiq.script_utils import buffered_output, eq_filter, storage_fingerprint
+from imiq.storage import ExcelStorage
+from imiq.storage_memory import MemoryStorage
+
+
+@pytest.mark.parametrize("dtype", [object, "string", str])
+def test_eq_filter_treats_missing_email_as_no_match(dtype):
+    """Test a user with a blank email neither matches nor breaks the comparison"""
+    users = pd.DataFrame({
+        'user_id': ['withmail', 'nomail'],
+        'email': pd.Series(['withmail@example.com', None], dtype=dtype)
+    })
+    
+    mask = eq_filter(users, 'email', 'withmail@example.com')
+    
+    assert mask.dtype == bool
+    assert mask.tolist() == [True, False]
+    assert not eq_filter(users, 'email', 'other@example.com').any()
+
+
+def test_eq_filter_large_sheet_with_missing_email(monkeypatch):
+    """Test the large-sheet branch gives the same answer with a blank email present"""
+    if not script_utils.NUMEXPR_AVAILABLE:
+        pytest.skip("numexpr not installed")
+    monkeypatch.setattr(script_utils, 'NUMEXPR_MIN_ROWS', 1)
+    users = pd.DataFrame({'email': pd.Series(['a@example.com', None, 'b@example.com'], dtype="string")})
+    
+    assert eq_filter(users, 'email', 'b@example.com').tolist() == [False, False, True]
+
+
+def test_storage_fingerprint_tracks_excel_writes(tmp_path, write_blank_workbook):
+    """Test the Excel fingerprint changes once the workbook is written to"""
+    path = tmp_path / "fp.xlsx"
+    write_blank_workbook(path, MemoryStorage().default_sheets)
+    storage = ExcelStorage(str(path))
+    
+    before = storage_fingerprint(storage, __file__)
+    assert before == storage_fingerprint(storage, __file__)
+    
+    storage.append_row("Users", {'user_id': 'fpuser', 'role': 'user'})
+    
+    assert storage_fingerprint(storage, __file__) != before
+
+
+def test_storage_fingerprint_uses_sheet_revision():
+    """Test a Google Sheets backend is keyed on its Drive revision, not a local file"""
+    class FakeSpreadsheet:
+        modified = '2026-01-01T00:00:00Z'
+        
+        def get_lastUpdateTime(self):
+            return self.modified
+    
+    class FakeSheetsStorage:
+        sheet_id = 'sheet123'
+        spreadsheet = FakeSpreadsheet()
+    
+    storage = FakeSheetsStorage()
+    before = storage_fingerprint(storage)
+    storage.spreadsheet.modified = '2026-01-02T00:00:00Z'
+    
+    assert before is not None
+    assert storage_fingerprint(storage) != before
+
+
+def test_storage_fingerprint_none_for_memory_storage():
+    """Test in-memory storage never yields a reusable fingerprint"""
+    assert storage_fingerprint(MemoryStorage(), __file__) is None
+
+
+def test_buffered_output_writes_once_when_done(capsys):
+    """Test output printed inside buffered_output only reaches stdout when the block ends"""
+    @buffered_output()
+    def report():
+        print("first")
+        assert capsys.readouterr().out == ""
+        print("second")
+        return True
+    
+    assert report()
+    assert capsys.readouterr().out == "first\nsecond\n"
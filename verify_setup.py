@@ -2,26 +2,38 @@
 
 import os
 import sys
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Script directory, resolved once; __main__'s __file__ is already absolute
+_HERE = os.path.dirname(__file__)
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+
+from imiq.script_utils import buffered_output
 
 # Set credentials like the app does
-credentials_path = os.path.join(os.path.dirname(__file__), 'service_account.json')
+credentials_path = os.path.join(_HERE, 'service_account.json')
 if os.path.exists(credentials_path):
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
     print(f"✅ Set GOOGLE_APPLICATION_CREDENTIALS: {credentials_path}")
 
-from imiq.storage import get_storage_instance, ExcelStorage
-from imiq.settings import SettingsService
-
-def verify_current_setup():
-    """Verify the current app setup matches what we expect"""
+@buffered_output()
+def verify_current_setup(fake=False):
+    """Verify the current app setup matches what we expect; `fake=True` runs against in-memory storage"""
     
     print("🔍 Verifying Current App Setup")
     print("=" * 50)
     
-    # Initialize like the app does
-    base_storage = ExcelStorage('CZ_MasterSheet.xlsx')  # App line 49
-    settings_service = SettingsService(base_storage)    # App base_services
+    # Imported here so loading this module doesn't pull in pandas/gspread
+    from imiq.bootstrap import get_app_session
+    from imiq.settings import SettingsService
+    
+    # Initialize like the app does (or in memory, so the checks run without any I/O)
+    if fake:
+        from imiq.storage_memory import MemoryStorage
+        storage = MemoryStorage()
+        settings_service = SettingsService(storage)
+    else:
+        session = get_app_session()                     # App lines 49-55, shared per workbook and storage secrets
+        settings_service, storage = session.settings_service, session.storage
     
     # Check settings
     use_gs = settings_service.get_setting('use_google_sheets', False)
@@ -31,8 +43,6 @@ def verify_current_setup():
     print(f"📋 google_sheet_id: {sheet_id}")
     print(f"📁 GOOGLE_APPLICATION_CREDENTIALS: {os.environ.get('GOOGLE_APPLICATION_CREDENTIALS', 'NOT SET')}")
     
-    # Get storage instance like the app does
-    storage = get_storage_instance(settings_service)    # App line 55
     print(f"📊 Storage type: {type(storage).__name__}")
     
     if hasattr(storage, 'sheet_id'):
@@ -45,8 +55,9 @@ def verify_current_setup():
         
         if not users_df.empty:
             print("Latest users:")
-            for _, user in users_df.tail(3).iterrows():
-                print(f"  - {user['user_id']}: {user['email']} ({user['role']})")
+            latest = users_df.tail(3)[['user_id', 'email', 'role']]
+            for user_id, email, role in latest.itertuples(index=False, name=None):
+                print(f"  - {user_id}: {email} ({role})")
         
         print("✅ Storage is working correctly!")
         return True
@@ -56,4 +67,8 @@ def verify_current_setup():
         return False
 
 if __name__ == "__main__":
-    verify_current_setup()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Verify the current app setup")
+    parser.add_argument('--fake', action='store_true',
+                        help="use in-memory storage instead of the workbook and Google Sheets")
+    verify_current_setup(fake=parser.parse_args().fake)
\ No newline at end of file